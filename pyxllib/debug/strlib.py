@@ -6,21 +6,144 @@
 
 
 import collections
-import copy
+import functools
 import io
+import itertools
 import pprint
 import re
 import sys
 import textwrap
+import unicodedata
 import logging
 
 
+import numpy as np
 import pandas as pd
 
 
 from pyxllib.debug.dprint import dprint
 
 
+def _ac_build(patterns):
+    """构造多模式匹配的AC自动机（纯python实现）
+
+    :param patterns: 模式串组成的tuple
+    :return: (goto, out)
+        goto: 每个状态的转移表，已经把失配指针的跳转预先合并进来了，
+            匹配时只要 goto[state].get(ch, 0) 一步到位，不用再沿着失配指针回溯
+        out: 每个状态能匹配上的所有模式串长度
+    """
+    # 1、建字典树
+    children, out = [{}], [()]
+    for x in patterns:
+        state = 0
+        for ch in x:
+            if ch not in children[state]:
+                children[state][ch] = len(children)
+                children.append({})
+                out.append(())
+            state = children[state][ch]
+        out[state] += (len(x),)
+
+    # 2、bfs计算失配指针，并合并出完整的转移表
+    goto = [None] * len(children)
+    goto[0] = children[0]
+    fail = [0] * len(children)
+    queue = collections.deque(children[0].values())
+    while queue:
+        u = queue.popleft()
+        for ch, v in children[u].items():
+            fail[v] = goto[fail[u]].get(ch, 0)
+            queue.append(v)
+        if u:
+            fail_goto = goto[fail[u]]
+            goto[u] = {**fail_goto, **children[u]} if fail_goto else children[u]
+            out[u] += out[fail[u]]
+    return goto, out
+
+
+@functools.lru_cache(maxsize=64)
+def _ac_automaton(patterns, use_c=True):
+    """获得多模式串patterns的AC自动机，优先使用pyahocorasick的C实现，没有安装时用纯python版本
+
+    :param patterns: 模式串组成的tuple
+    :param use_c: 是否尝试使用pyahocorasick，设为False时强制使用纯python版本
+    :return: (finditer, maxlen)
+        finditer(s, start): 从s[start]开始扫描，按结束位置的顺序生成所有匹配的 (结束位置, 模式串长度)
+        maxlen: 最长模式串的长度
+
+    >>> for use_c in (True, False):  # 两种实现的匹配结果相同
+    ...     finditer, maxlen = _ac_automaton(('he', 'she', 'his', 'hers'), use_c)
+    ...     print(sorted(finditer('ushers', 0)), sorted(finditer('ushers', 2)), maxlen)
+    [(3, 2), (3, 3), (5, 4)] [(3, 2), (5, 4)] 4
+    [(3, 2), (3, 3), (5, 4)] [(3, 2), (5, 4)] 4
+
+    >>> finditer, maxlen = _ac_automaton(('ab', 'bc', 'abcd', 'c'), use_c=False)
+    >>> _ac_leftmost_start('xabcd', 0, finditer, maxlen)  # 起始位置最靠前，同一位置取最短的
+    (1, 2)
+    >>> _ac_leftmost_end('xabcd', 0, finditer)
+    (2, 2)
+    """
+    maxlen = max(map(len, patterns), default=0)
+    ahocorasick = None
+    if use_c:
+        try:
+            import ahocorasick
+        except ModuleNotFoundError:
+            pass
+
+    if ahocorasick is None:
+        goto, out = _ac_build(patterns)
+
+        def finditer(s, start):
+            state = 0
+            for i in range(start, len(s)):
+                state = goto[state].get(s[i], 0)
+                for k in out[state]:
+                    yield i, k
+    else:
+        automaton = ahocorasick.Automaton()
+        for i, x in enumerate(patterns):
+            automaton.add_word(x, (i, len(x)))
+        automaton.make_automaton()
+
+        def finditer(s, start):
+            for i, (_, k) in automaton.iter(s, start):
+                yield i, k
+
+    return finditer, maxlen
+
+
+@functools.lru_cache()
+def _ac_min_patterns():
+    """模式串数量达到这个值才用AC自动机，数量少时逐个str.find查找反而更快
+
+    临界值按命中稀少（最常见、也是对AC自动机最不利）的情况实测：
+        20万随机字母、5字符模式串，pyahocorasick约30个模式串起更快，纯python版本约120个起更快
+    """
+    try:
+        import ahocorasick
+    except ModuleNotFoundError:
+        return 120  # 纯python版本的自动机要逐字符扫描，模式串多到一定程度才划算
+    return 30
+
+
+def _ac_leftmost_start(s, start, finditer, maxlen):
+    """从s[start]开始扫描，返回起始位置最靠前的匹配 (起始位置, 模式串长度)，找不到返回 (-1, 0)"""
+    p, plen = -1, 0
+    for i, k in finditer(s, start):
+        if p != -1 and i - maxlen >= p:  # 后面的匹配起始位置不可能比p更靠前了
+            break
+        if p == -1 or i - k + 1 < p:
+            p, plen = i - k + 1, k
+    return p, plen
+
+
+def _ac_leftmost_end(s, start, finditer):
+    """从s[start]开始扫描，返回结束位置最靠前的匹配 (结束位置, 模式串长度)，找不到返回 (-1, 0)"""
+    return next(finditer(s, start), (-1, 0))
+
+
 def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
     r"""进行强大功能扩展的的字符串查找函数。
     TODO 性能有待优化
@@ -30,7 +153,7 @@ def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
     2
 
     :param objstr: 需要查找的目标字符串，可以是一个list或tuple
-    TODO 有空看下AC自动机，看这里是否可以优化提速，或者找现成的库接口
+        模式串不多时逐个用str.find查找，达到_ac_min_patterns()个时改用AC自动机一次扫描完成匹配
     >>> strfind('bbaaaabb', 'bb') # 查找第1次出现的位置
     0
     >>> strfind('aabbaabb', 'bb', times=1) # 查找第2次出现的位置
@@ -39,6 +162,8 @@ def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
     -1
     >>> strfind('aabbaabb', ['aa', 'bb'], times=2)
     4
+    >>> strfind('aabbaabb', ['aa', 'bb'], times=-2)
+    4
 
     :param start: 起始查找位置。默认值为0，当times<0时start的默认值为-1。
     >>> strfind('aabbaabb', 'bb', start=2) # 恰好在起始位置
@@ -47,6 +172,10 @@ def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
     6
     >>> strfind('aabbaabb', ['aa', 'bb'], start=5)
     6
+    >>> strfind('xxabxx', ['ab', 'cd'], start=-2, times=-1)  # 负数start同python下标
+    2
+    >>> strfind('xxabxx', ['ab', 'cd'], start=-3)
+    -1
 
     :param times: 定位第几次出现的位置，默认值为0，即从前往后第1次出现的位置。
         如果是负数，则反向查找，并返回的是目标字符串的起始位置。
@@ -64,21 +193,37 @@ def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
     2
     >>> strfind('aaaa', 'aa', times=1, overlap=True)
     1
+    >>> strfind('aaaa', ['aa', 'bb'], times=1)
+    2
+    >>> strfind('aaaa', ['aa', 'bb'], times=1, overlap=True)
+    1
+
+    反向查找时，不重叠是指下一个匹配要在上一个匹配的起始位置之前结束，
+    重叠是指下一个匹配的结束位置比上一个匹配的结束位置靠前即可
+    >>> strfind('aaaa', ['aa', 'bb'], times=-2)
+    0
+    >>> strfind('aaaa', ['aa', 'bb'], times=-2, overlap=True)
+    1
+
+    模式串足够多时用AC自动机匹配，结果跟逐个str.find查找一致
+    >>> many = ['aa', 'bb'] + [f'z{i}' for i in range(150)]
+    >>> strfind('aabbaabb', many, times=2), strfind('aabbaabb', many, times=-2)
+    (4, 4)
+    >>> strfind('aaaa', many, times=1), strfind('aaaa', many, times=1, overlap=True)
+    (2, 1)
+    >>> strfind('aaaa', many, times=-2), strfind('aaaa', many, times=-2, overlap=True)
+    (0, 1)
+    >>> strfind('xxabxx', many + ['ab'], start=-2, times=-1), strfind('xxabxx', many + ['ab'], start=-3)
+    (2, -1)
 
     >>> strfind(r'\item=\item+', (r'\item', r'\test'), start=1)
     6
+    >>> strfind('abc', ['', 'b'])
+    0
+    >>> strfind('abc', ['', 'b'], times=-1)
+    3
     """
 
-    def nonnegative_min_value(*arr):
-        """计算出最小非负整数，如果没有非负数，则返回-1"""
-        arr = tuple(filter(lambda x: x >= 0, arr))
-        return min(arr) if arr else -1
-
-    def nonnegative_max_value(*arr):
-        """计算出最大非负整数，如果没有非负数，则返回-1"""
-        arr = tuple(filter(lambda x: x >= 0, arr))
-        return max(arr) if arr else -1
-
     # 1、根据times不同，start的初始默认值设置方式也不同
     if times < 0 and start is None:
         start = len(fullstr) - 1  # 反向查找start设到末尾字符-1
@@ -91,7 +236,13 @@ def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
         offset = 1 if overlap else len(objstr)  # overlap影响每次偏移量
 
         # A、正向查找
-        if times >= 0:
+        if times >= 64 and not overlap and objstr:
+            # 查找次数较多时，用split让逐个查找的循环在C层面完成，最后一段之前就是目标串的位置
+            parts = fullstr[start:].split(objstr, times + 1)
+            if len(parts) <= times + 1:
+                return -1
+            p = len(fullstr) - len(parts[-1]) - len(objstr)
+        elif times >= 0:
             p = start - offset
             for _ in range(times + 1):
                 p = fullstr.find(objstr, p + offset)
@@ -106,42 +257,93 @@ def strfind(fullstr, objstr, *, start=None, times=0, overlap=False):
                 if p == -1:
                     return -1
 
-    # 3、多模式匹配（递归调用，依赖单串匹配功能）
+    # 3、多模式匹配
+    elif len(objstr) < 2:  # 只有一个模式串，退化为单串匹配
+        return strfind(fullstr, objstr[0], start=start, times=times, overlap=overlap) if objstr else -1
+    elif '' in objstr:  # 空串在任何位置都能匹配上，结果同单串匹配空串
+        return strfind(fullstr, '', start=start, times=times, overlap=overlap)
     else:
-        # A、正向查找
+        # 负数start按python下标的规则转成正数，跟单串匹配时str.find、str.rfind的处理方式一致
+        #   反向查找时，相当于是对查找范围的结束位置start+1套用下标规则
         if times >= 0:
-            p = start - 1
-            for _ in range(times + 1):
-                # 把每个目标串都找一遍下一次出现的位置，取最近的一个
-                #   因为只找第一次出现的位置，所以overlap参数传不传都没有影响
-                # TODO 需要进行性能对比分析，有必要的话后续可以改AC自动机实现多模式匹配
-                ls = tuple(map(lambda x: strfind(fullstr, x, start=p + 1, overlap=overlap), objstr))
-                p = nonnegative_min_value(*ls)
-                if p == -1:
-                    return -1
-
-        # B、反向查找
-        else:
-            p = start + 1
-            for _ in range(-times):  # 需要循环处理的次数
-                # 使用map对每个要查找的目标调用strfind
-                ls = tuple(map(lambda x: strfind(fullstr, x, start=p - 1, times=-1, overlap=overlap), objstr))
-                p = nonnegative_max_value(*ls)
-                if p == -1:
-                    return -1
+            if start < 0:
+                start = max(start + len(fullstr), 0)
+        elif start < -1:
+            start += len(fullstr)
+
+        if len(objstr) < _ac_min_patterns():  # 模式串不多时，逐个用str.find查找反而比AC自动机快
+            # A、正向查找：找起始位置最靠前的匹配，同一位置有多个匹配时取最短的
+            if times >= 0:
+                for _ in range(times + 1):
+                    p, plen = -1, 0
+                    for x in objstr:
+                        q = fullstr.find(x, start)
+                        if q != -1 and (p == -1 or q < p or (q == p and len(x) < plen)):
+                            p, plen = q, len(x)
+                    if p == -1:
+                        return -1
+                    start = p + (1 if overlap else plen)
+
+            # B、反向查找：在fullstr[:start+1]范围内找起始位置最靠后的匹配，同一位置有多个匹配时取最长的
+            else:
+                for _ in range(-times):
+                    if start < 0:
+                        return -1
+                    p, plen = -1, 0
+                    for x in objstr:
+                        q = fullstr.rfind(x, 0, start + 1)
+                        if q > p or (q == p != -1 and len(x) > plen):
+                            p, plen = q, len(x)
+                    if p == -1:
+                        return -1
+                    start = p - 1 if not overlap else p + plen - 2
+        else:  # 用AC自动机一次扫描完成所有模式串的匹配
+            # A、正向查找：找起始位置最靠前的匹配
+            if times >= 0:
+                finditer, maxlen = _ac_automaton(tuple(objstr))
+                for _ in range(times + 1):
+                    p, plen = _ac_leftmost_start(fullstr, start, finditer, maxlen)
+                    if p == -1:
+                        return -1
+                    start = p + (1 if overlap else plen)  # overlap影响下一次的起始查找位置
+
+            # B、反向查找：在fullstr[:start+1]范围内找起始位置最靠后的匹配
+            #   等价于把原串、模式串都翻转后，正向找结束位置最靠前的匹配
+            else:
+                finditer, _ = _ac_automaton(tuple(x[::-1] for x in objstr))
+                n = len(fullstr)
+                rstr = fullstr[::-1]
+                for _ in range(-times):
+                    if start < 0:
+                        return -1
+                    i, plen = _ac_leftmost_end(rstr, max(n - 1 - start, 0), finditer)
+                    if i == -1:
+                        return -1
+                    p = n - 1 - i
+                    start = p - 1 if not overlap else p + plen - 2  # 下一次匹配的结束位置上限
 
     return p
 
 
-def natural_sort_key(key):
-    def convert(text):
-        return int(text) if text.isdigit() else text.lower()
+_NAT_SPLIT = re.compile(r'([0-9]+)').split
+
 
-    return [convert(c) for c in re.split('([0-9]+)', str(key))]
+def natural_sort_key(key):
+    """
+    >>> natural_sort_key('a10B2')
+    ['a', 10, 'b', 2, '']
+    """
+    return [int(c) if c.isdigit() else c.lower() for c in _NAT_SPLIT(str(key))]
 
 
 def natural_sort(ls):
-    """自然排序"""
+    """自然排序
+
+    >>> natural_sort(['a10', 'a2', 'A1', 'a2'])
+    ['A1', 'a2', 'a2', 'a10']
+    >>> natural_sort([True, 1, 0.5])
+    [0.5, 1, True]
+    """
     return sorted(ls, key=natural_sort_key)
 
 
@@ -158,17 +360,39 @@ ____str = """
 """
 
 
+_EAW_WIDTH = {'Na': 1, 'N': 1, 'W': 2, 'F': 2, 'H': 1}  # 同pandas的EastAsianTextAdjustment，'A'歧义字符另外处理
+
+
+@functools.lru_cache(maxsize=4096)
+def _eaw_len(s, ambiguous_width=1):
+    return sum(_EAW_WIDTH.get(unicodedata.east_asian_width(c), ambiguous_width) for c in s)
+
+
 def east_asian_len(s, ambiguous_width=None):
-    import pandas.io.formats.format as fmt
-    return fmt.EastAsianTextAdjustment().len(s)
+    """考虑东亚字符的域宽计算，结果同pandas的EastAsianTextAdjustment().len(s)
+
+    :param ambiguous_width: ①②③这种歧义字符的域宽，默认根据pandas的display.unicode.ambiguous_as_wide配置确定
+
+    >>> east_asian_len('a啊b')
+    4
+    >>> east_asian_len('①', ambiguous_width=2)
+    2
+    """
+    if ambiguous_width is None:
+        ambiguous_width = 2 if pd.get_option('display.unicode.ambiguous_as_wide') else 1
+    return _eaw_len(s, ambiguous_width)
 
 
-def east_asian_shorten(s, width=50, placeholder='...'):
+_WS_RE = re.compile(r'\s+')
+
+
+def east_asian_shorten(s, width=50, placeholder='...', ambiguous_width=None):
     """考虑中文情况下的域宽截断
 
     :param s: 要处理的字符串
     :param width: 宽度上限，仅能达到width-1的宽度
     :param placeholder: 如果做了截断，末尾补足字符
+    :param ambiguous_width: 歧义字符的域宽，同east_asian_len，批量调用时最好显式传入
 
     # width比placeholder还小
     >>> east_asian_shorten('a', 2)
@@ -188,13 +412,15 @@ def east_asian_shorten(s, width=50, placeholder='...'):
     'a啊ba啊ba啊ba啊b'
     """
     # 一、如果字符串本身不到width设限，返回原值
-    s = textwrap.shorten(s, width * 3, placeholder='')  # 用textwrap的折行功能，尽量不删除文本
-    n = east_asian_len(s)
+    s = _WS_RE.sub(' ', s).strip()  # 连续空白合并成一个空格
+    if ambiguous_width is None:
+        ambiguous_width = 2 if pd.get_option('display.unicode.ambiguous_as_wide') else 1
+    n = _eaw_len(s, ambiguous_width)
     if n < width: return s
 
     # 二、如果输入的width比placeholder还短
     width -= 1
-    m = east_asian_len(placeholder)
+    m = _eaw_len(placeholder, ambiguous_width)
     if width <= m:
         return placeholder[:width]
 
@@ -206,7 +432,7 @@ def east_asian_shorten(s, width=50, placeholder='...'):
     try:
         s = s.encode('gbk')[:width].decode('gbk', errors='ignore')
     except UnicodeEncodeError:
-        i, count = 0, m
+        i, count, n = 0, m, len(s)
         while i < n and count <= width:
             if ord(s[i]) > 127:
                 count += 2
@@ -235,16 +461,27 @@ def dataframe_str(df, *args, ambiguous_as_wide=None, shorten=True):
         0  aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa...
         1   哈 ①哈 ①哈 ①哈 ①哈 ①哈 ①哈 ①哈 ①哈 ①...
         2  a哈a哈a哈a哈a哈a哈a哈a哈a哈a哈a哈a哈a哈a哈a哈a...
+
+    每个元素按所在列原本的类型字符串化，整数列不会因为有浮点数列而显示成1.0
+    >>> print(dataframe_str(pd.DataFrame({'i': [1, 2], 'f': [1.5, 2.25]})))
+       i     f
+    0  1   1.5
+    1  2  2.25
     """
     if ambiguous_as_wide is None:
         ambiguous_as_wide = sys.platform == 'win32'
     with pd.option_context('display.unicode.east_asian_width', True,  # 中文输出必备选项，用来控制正确的域宽
                            'display.unicode.ambiguous_as_wide', ambiguous_as_wide,
-                           'max_columns', 20,  # 最大列数设置到20列
+                           'display.max_columns', 20,  # 最大列数设置到20列
                            'display.width', 200,  # 最大宽度设置到200
                            *args):
-        if shorten:  # applymap可以对所有的元素进行映射处理，并返回一个新的df
-            df = df.applymap(lambda x: east_asian_shorten(str(x), pd.options.display.max_colwidth))
+        if shorten:  # 展平成一维数组统一处理所有元素，再还原成新的df
+            width = pd.options.display.max_colwidth
+            ambiguous_width = 2 if pd.options.display.unicode.ambiguous_as_wide else 1
+            vals = df.astype(object).to_numpy()  # 转object保留每列原本的元素类型，不会被统一转成float等
+            shorten_vals = np.empty(vals.size, dtype=object)
+            shorten_vals[:] = [east_asian_shorten(str(x), width, ambiguous_width=ambiguous_width) for x in vals.ravel()]
+            df = pd.DataFrame(shorten_vals.reshape(vals.shape), index=df.index, columns=df.columns)
         s = str(df)
     return s
 
@@ -333,21 +570,39 @@ def realign(text, least_blank=4, tab2blank=4, support_chinese=False, sep=None):
     if sep is None: sep = ' ' * least_blank
 
     # 2、计算出每一列的最大宽度
-    lines = s.splitlines()
-    n = len(lines)
-    max_width = GrowingList()  # 因为不知道有多少列，用自增长的list来存储每一列的最大宽度
-    for i, line in enumerate(lines):
-        line = line.strip().split('\t')
-        m = len(line)
-        for j in range(m): max_width[j] = max(max_width[j] if max_width[j] else 0, lenfunc(line[j]))
-        lines[i] = line
+    lines = [line.strip().split('\t') for line in s.splitlines()]
+    max_width = [0] * max(map(len, lines), default=0)  # 先拆分出所有行，就能知道列数，直接开好定长list
+    for line in lines:
+        for j, x in enumerate(line):
+            w = lenfunc(x)
+            if w > max_width[j]: max_width[j] = w
     if len(max_width) == 1: return '\n'.join(map(lambda x: x[0], lines))
 
     # 3、重组内容
-    for i, line in enumerate(lines):
-        for j in range(len(line) - 1): line[j] += ' ' * (max_width[j] - lenfunc(line[j]))  # 注意最后一列就不用加空格了
-        lines[i] = sep.join(line)
-    return '\n'.join(lines)
+    for line in lines:
+        for j in range(len(line) - 1):  # 注意最后一列就不用加空格了
+            x = line[j]
+            line[j] = x.ljust(max_width[j] - lenfunc(x) + len(x))  # ljust按字符数补齐，要扣掉中文多占的宽度
+    return '\n'.join([sep.join(line) for line in lines])
+
+
+class _ChunkWriter(io.TextIOBase):
+    """只追加记录写入的字符串片段，需要时再一次性拼接，避免大量输出时StringIO反复扩容"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def write(self, s):
+        self._chunks.append(s)
+        return len(s)
+
+    def getvalue(self):
+        return ''.join(self._chunks)
+
+    def close(self):
+        self._chunks = []
+        super().close()
 
 
 class Stdout:
@@ -367,7 +622,7 @@ class Stdout:
         self.origin_stdout = sys.stdout
         self._path = path
         self._mode = mode
-        self.strout = io.StringIO()
+        self.strout = _ChunkWriter()
         self.result = None
 
     def __enter__(self):
@@ -419,15 +674,16 @@ def shorten(s, width=200, placeholder='...'):
     >>> shorten('0123456789 0123456789', 11)  # 自己写的shorten
     '0123456789 '
     """
-    s = re.sub(r'\s+', ' ', str(s))
-    n = len(s)
-    if n > width:
-        s = s[:width]
-    return s
+    s = str(s)
+    # 除了ascii空格，其他空白字符都是不可打印字符，所以没有连续空格且全是可打印字符时，就不用走正则替换了
+    if '  ' in s or not s.isprintable():
+        s = _WS_RE.sub(' ', s)
+    return s[:width] if len(s) > width else s
 
     # return textwrap.shorten(str(s), width)
 
 
+@functools.lru_cache(maxsize=4096)
 def strwidth(s):
     """string width
     中英字符串实际宽度
@@ -441,14 +697,22 @@ def strwidth(s):
     try:
         res = len(s.encode('gbk'))
     except UnicodeEncodeError:
-        count = len(s)
-        for x in s:
-            if ord(x) > 127:
-                count += 1
-        res = count
+        res = _strwidth_cp(s)
     return res
 
 
+_UTF8_NON_LEAD = bytes(range(0xC0))  # utf8编码中，每个非ascii字符有且仅有一个>=0xC0的首字节
+
+
+def _strwidth_cp(s):
+    """按unicode码位计算字符串宽度，非ascii字符算宽度2
+
+    >>> _strwidth_cp('a⑪中⑩😀')
+    9
+    """
+    return len(s) + len(s.encode('utf-8', 'surrogatepass').translate(None, _UTF8_NON_LEAD))
+
+
 def strwidth_proc(s, fmt='r', chinese_char_width=1.8):
     """ 此函数主要用于每个汉字域宽是w=1.8的情况
 
@@ -473,13 +737,17 @@ def strwidth_proc(s, fmt='r', chinese_char_width=1.8):
     x = l1 - y  # 英文字符数
     # ch = chr(12288)  # 中文空格
     ch = chr(12288)  # 中文空格
-    w = x + y * chinese_char_width  # 当前字符串宽度
     # 2、计算需要补充t个中文空格
-    error = 0.05  # 允许误差范围
-    t = 0  # 需要补充中文字符数
-    while error < w % 1 < 1 - error:  # 小数部分超过误差
-        t += 1
-        w += chinese_char_width
+    if chinese_char_width == 1.8:  # 最常用的情况，1.8=9/5，汉字数凑到5的倍数时宽度恰好为整数，可以直接算出t
+        t = -y % 5
+        w = x + (y + t) * 9 // 5
+    else:
+        w = x + y * chinese_char_width  # 当前字符串宽度
+        error = 0.05  # 允许误差范围
+        t = 0  # 需要补充中文字符数
+        while error < w % 1 < 1 - error:  # 小数部分超过误差
+            t += 1
+            w += chinese_char_width
     # 3、补充中文字符
     if t:
         if fmt == 'r':
@@ -605,9 +873,16 @@ def swap_rowcol(a, *, ensure_arr=False, default_value=''):
 
     >>> swap_rowcol([[1,2,3], [4,5,6]])
     [[1, 4], [2, 5], [3, 6]]
+    >>> swap_rowcol(np.array([[1,2,3], [4,5,6]]))
+    [[1, 4], [2, 5], [3, 6]]
+    >>> swap_rowcol([[1,2,3], [4], 5], ensure_arr=True)
+    [[1, 4, 5], [2, '', ''], [3, '', '']]
     """
-    if ensure_arr:
-        a = ensure_array(a, default_value)
+    if isinstance(a, np.ndarray) and a.ndim == 2:  # numpy矩阵本身就是规整的，直接在C层面转置
+        return a.T.tolist()
+    if ensure_arr:  # 不用先ensure_array补齐出一个中间矩阵，转置时直接补上缺失值
+        rows = [x if isinstance(x, (list, tuple)) else [x] for x in a]
+        return [list(col) for col in itertools.zip_longest(*rows, fillvalue=str(default_value))]
     # 这是非常有教学意义的行列互换实现代码
     return list(map(list, zip(*a)))
 
@@ -621,6 +896,16 @@ def int2excel_col_name(d):
     >>> int2excel_col_name(100)
     'CV'
     """
+    # 最多3个字母（ZZZ=18278）已经覆盖绝大部分实际情况，直接展开计算
+    if 0 < d <= 26:
+        return chr(64 + d)
+    elif 26 < d <= 18278:
+        q, r = divmod(d - 1, 26)
+        if q <= 26:
+            return chr(64 + q) + chr(65 + r)
+        q2, r2 = divmod(q - 1, 26)
+        return chr(64 + q2) + chr(65 + r2) + chr(65 + r)
+
     s = []
     while d:
         t = (d - 1) % 26
@@ -629,6 +914,38 @@ def int2excel_col_name(d):
     return ''.join(reversed(s))
 
 
+def int2excel_col_name_array(ds):
+    """int2excel_col_name的批量版本
+
+    >>> int2excel_col_name_array([1, 28, 100, 18279])
+    ['A', 'AB', 'CV', 'AAAA']
+    >>> int2excel_col_name_array([1, 2 ** 64])  # 超出int64范围时逐个用int2excel_col_name计算
+    ['A', 'GKGWBYLWRXTLPP']
+    """
+    d = np.asarray(ds)
+    if d.ndim != 1:
+        raise ValueError(f'ds应该是一维的整数序列，实际维数为{d.ndim}')
+    if d.dtype == object:  # 有超出int64范围的大整数
+        return [int2excel_col_name(x) for x in ds]
+    if d.size and not np.issubdtype(d.dtype, np.integer):
+        raise TypeError(f'ds应该是整数序列，实际类型为{d.dtype}')
+    d = d.astype(np.int64)
+    # 1、计算每个数对应的字母个数
+    lens = np.zeros(d.size, dtype=np.int64)
+    t = d.copy()
+    while t.any():
+        lens += t > 0
+        t = np.where(t > 0, (t - 1) // 26, 0)
+    # 2、从低位到高位，把每个字母填到对应位置
+    k = max(int(lens.max(initial=0)), 1)
+    chars = np.zeros((d.size, k), dtype=np.uint8)
+    for j in range(k):
+        rows = np.nonzero(lens > j)[0]
+        chars[rows, lens[rows] - 1 - j] = 65 + (d[rows] - 1) % 26
+        d = np.where(d > 0, (d - 1) // 26, 0)
+    return chars.view(f'S{k}').ravel().astype(str).tolist()
+
+
 def excel_col_name2int(s):
     """
     >>> excel_col_name2int('A')
@@ -644,12 +961,38 @@ def excel_col_name2int(s):
     return d
 
 
+def excel_col_name2int_array(names):
+    """excel_col_name2int的批量版本
+
+    >>> excel_col_name2int_array(['A', 'AB', 'CV', 'AAAA'])
+    [1, 28, 100, 18279]
+    >>> excel_col_name2int_array(['A', 'ZZZZZZZZZZZZZZ'])  # 超出int64范围时逐个用excel_col_name2int计算
+    [1, 67090373691429037014]
+    """
+    if isinstance(names, str):
+        raise TypeError('names应该是字符串组成的序列，单个字符串请用excel_col_name2int')
+    chars = np.array(names, dtype=bytes)
+    if chars.ndim != 1:
+        raise ValueError(f'names应该是一维的字符串序列，实际维数为{chars.ndim}')
+    if chars.itemsize > 13:  # int64最多只能存下13个字母的列名
+        return [excel_col_name2int(x) for x in names]
+    chars = chars.view(np.uint8).reshape(chars.size, chars.itemsize).astype(np.int64)
+    d = np.zeros(chars.shape[0], dtype=np.int64)
+    for j in range(chars.shape[1]):  # 按列做秦九韶（Horner）累加，字符串末尾的补位0不参与计算
+        col = chars[:, j]
+        d = np.where(col > 0, d * 26 + (col - 64), d)
+    return d.tolist()
+
+
+_MYALPHAENUM = '_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
 def int2myalphaenum(n):
     """
     :param n: 0~52的数字
     """
     if 0 <= n <= 52:
-        return '_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'[n]
+        return _MYALPHAENUM[n]
     else:
         dprint(n)  # 不在处理范围内的数值
         raise ValueError
@@ -749,13 +1092,15 @@ def arr_hangclear(arr, depth=None):
     [[1, 2, 4], ['', '', 5], [2, 2, 5], [1, 2, 5]]
     """
     m = depth if depth else len_in_dim2(arr) - 1
-    a = copy.deepcopy(arr)
+    # 只会把单元格改成''，不会修改元素内部的值，所以逐行浅拷贝就够了
+    a = [list(row) if isinstance(row, (list, tuple)) else [row] for row in arr]
 
     # 算法原理：从下到上，从右到左判断与上一行重叠了几列数据
-    for i in range(len(arr) - 1, 0, -1):
+    for i in range(len(a) - 1, 0, -1):
+        cur, prev = a[i], a[i - 1]
         for j in range(m):
-            if a[i][j] == a[i - 1][j]:
-                a[i][j] = ''
+            if cur[j] == prev[j]:
+                cur[j] = ''
             else:
                 break
     return a
@@ -773,21 +1118,26 @@ def arr2table(arr, rowmerge=False):
     """
     n = len(arr)
     m = len_in_dim2(arr)
+
+    # 1、从下往上扫描一遍，算出每个单元格要向下合并的行数
+    #   (i, j)能向下合并第r行，当且仅当第r行的第0~j列全是空值
+    rowspan = [None] * n
+    if rowmerge:
+        run = [0] * m  # run[j]：从当前行的下一行开始，连续有几行的第0~j列全是空值
+        for i in range(n - 1, -1, -1):
+            line = arr[i]
+            rowspan[i] = [x + 1 for x in run]
+            lead = next((k for k, x in enumerate(line) if x != ''), len(line))  # 该行开头连续空值的个数
+            run = [x + 1 for x in run[:lead]] + [0] * (m - lead)
+
+    # 2、生成html代码
     res = ['<table border="1"><tbody>']
     for i, line in enumerate(arr):
         res.append('<tr>')
         for j, ele in enumerate(line):
             if rowmerge:
                 if ele != '':
-                    cnt = 1
-                    while i + cnt < n and arr[i + cnt][j] == '':
-                        for k in range(j - 1, -1, -1):
-                            if arr[i + cnt][k] != '':
-                                break
-                        else:
-                            cnt += 1
-                            continue
-                        break
+                    cnt = rowspan[i][j]
                     if cnt > 1:
                         res.append(f'<td rowspan="{cnt}">{ele}</td>')
                     else:
@@ -801,6 +1151,10 @@ def arr2table(arr, rowmerge=False):
     return ''.join(res)
 
 
+_WEEKTAG = {i: '周' + ch for i, ch in enumerate('一二三四五六日', start=1)}
+_WEEKTAG.update({str(k): v for k, v in _WEEKTAG.items()})  # 常见的字符串输入也能直接查表
+
+
 def digit2weektag(d):
     """输入数字1~7，转为“周一~周日”
 
@@ -809,8 +1163,9 @@ def digit2weektag(d):
     >>> digit2weektag('7')
     '周日'
     """
-    d = int(d)
-    if 1 <= d <= 7:
-        return '周' + '一二三四五六日'[d - 1]
-    else:
-        raise ValueError
+    tag = _WEEKTAG.get(d)
+    if tag is None:
+        tag = _WEEKTAG.get(int(d))
+        if tag is None:
+            raise ValueError
+    return tag